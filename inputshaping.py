@@ -31,9 +31,14 @@
 from __future__ import print_function
 import matplotlib.pyplot as mpl
 import numpy as np
+import os
 
 __version__ = "1.0"
 
+UM_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inputshaping_umtables.npz")
+UM_AMPS = {"UMZV": [1, -1, 1], "UMZVD": [1, -1, 1, -1, 1]}
+_umTables = {}
+
 
 class InputShaper:
     """
@@ -52,10 +57,13 @@ class InputShaper:
     but modifies the shaped command less than the original input shaper, enter:
     >>> myShaperObject.ZVD(0.5)
 
-    NOTE: The UMZV and UMZVD input shapers are generated using polynomials in
-    damping ratio zeta, and they may not be effective for damping ratios greater
-    than zeta = 0.3.  They are also limited to amplitude values of -1 and 1, so
-    adjusting the shaper strength of UMZV and UMZVD shapers is not an option.
+    NOTE: The UMZV and UMZVD impulse times are interpolated from precomputed
+    tables of exact solutions (see um_impulse_times()), which cover damping
+    ratios from zeta = 0 to zetaMax = 0.9 (see um_table_bounds()).  Unlike the
+    polynomial fits used previously, UMZV() and UMZVD() raise AssertionError
+    for damping ratios above zetaMax.  These shapers are limited to amplitude
+    values of -1 and 1, so adjusting the shaper strength of UMZV and UMZVD
+    shapers is not an option.
     """
 
 
@@ -241,11 +249,9 @@ class InputShaper:
         """
         self.shaperType = "UMZV"
         self.strengthFrac = 1
-        t2 = scaled_cubic(0.16724, 0.27242, 0.20345, 0, self.zeta, self.Tn)
-        t3 = scaled_cubic(0.33323, 0.00533, 0.17914, 0.20125, self.zeta, self.Tn)
         self.conNum = 3
         self.conAmps = [1, -1, 1]
-        self.conTimes = [0, t2, t3]
+        self.conTimes = um_impulse_times("UMZV", self.zeta, self.Tn)
         (self.digNum, self.digAmps, self.digTimes, self.digFrames) = digitize_shaper(self.conAmps, self.conTimes, self.wn, self.zeta, self.dt)
 
 
@@ -256,13 +262,9 @@ class InputShaper:
         """
         self.shaperType = "UMZVD"
         self.strengthFrac = 1
-        t2 = scaled_cubic(0.08945, 0.28411, 0.23013, 0.16401, self.zeta, self.Tn)
-        t3 = scaled_cubic(0.36613, -0.08833, 0.24048, 0.17001, self.zeta, self.Tn)
-        t4 = scaled_cubic(0.64277, 0.29103, 0.23262, 0.43784, self.zeta, self.Tn)
-        t5 = scaled_cubic(0.73228, 0.00992, 0.49385, 0.38633, self.zeta, self.Tn)
         self.conNum = 5
         self.conAmps = [1, -1, 1, -1, 1]
-        self.conTimes = [0, t2, t3, t4, t5]
+        self.conTimes = um_impulse_times("UMZVD", self.zeta, self.Tn)
         (self.digNum, self.digAmps, self.digTimes, self.digFrames) = digitize_shaper(self.conAmps, self.conTimes, self.wn, self.zeta, self.dt)
 
     
@@ -332,6 +334,21 @@ class InputShaper:
         self.conAmps = [k/sum(self.conAmps) for k in self.conAmps]
 
 
+    def quantize(self, precision="float32"):
+        """
+        Returns the digital input shaper amplitudes in reduced precision, for
+        high-throughput filtering with shape_signal(), along with the increase
+        in residual vibration at the modeled mode caused by the rounding:
+        >>> (quantAmps, vibPenalty) = myShaperObject.quantize("float32")
+
+        Precision can be "float32", "float16", or an integer number of
+        fractional bits for fixed-point integer weights (e.g. 15 for Q15).  In
+        all cases the quantized amplitudes sum to exactly one (or exactly
+        2**fractionalBits for integer weights), so the DC gain stays unity.
+        """
+        return quantize_shaper(self.digAmps, self.digTimes, self.wn, self.zeta, precision)
+
+
     def sensitivity_curve(self, xLimits=[0.5, 1.5], wnNormalized=False):
         """
         Shows the level of residual vibration allowed by the input shaper as a
@@ -357,6 +374,314 @@ class InputShaper:
         mpl.show()
 
 
+class ModalIdentifier:
+    """
+    To estimate the dominant mode of a vibration signal (e.g. accelerometer
+    data) sampled at fps = 100, feed the measurements in chunks of any length:
+    >>> myIdentifier = ModalIdentifier(100)
+    >>> newEstimates = myIdentifier.update(firstChunk)
+    >>> newEstimates = myIdentifier.update(secondChunk)
+
+    Only the most recent "windowLength" samples are buffered, so memory use
+    does not grow with the length of the log.  Each full window is analyzed as
+    follows: the vibration frequency is picked from the peak of the windowed
+    FFT, starting values for the decay rate and damped frequency are found from
+    the log-decrement and phase of the band-pass filtered signal, and a damped
+    sinusoid is then fit to the free decay (see fit_damped_sinusoid()).  Every
+    accepted window produces a (wn, zeta, confidence) tuple, where confidence
+    is between 0 (no fit) and 1 (perfect damped sinusoid).  Windows with a
+    confidence below "minConfidence", such as steady excitation or rigid-body
+    motion, are rejected.
+
+    To reject sensor noise during quiet stretches of the log, the identifier
+    tracks a noise floor and only fits windows whose peak is at least "minSNR"
+    times that floor.  The floor follows the lowest RMS of any eighth of a
+    window seen so far, rising by "noiseRiseFrac" per window so it can track a
+    slowly increasing noise level.  The last "historyLength" fitted frequencies
+    are also kept, and an estimate is only accepted once at least three have
+    been fitted and it lies within "wnTolerance" (as a fraction) of their
+    median, so occasional spurious fits do not move the estimate.
+
+    The accepted estimates are combined into a running estimate, weighted by
+    their confidence.  Older estimates are forgotten at a rate set by
+    "forgetFrac" between 0 (keep only the newest estimate) and 1 (never
+    forget), so the running estimate follows slow drift of the mode.  The
+    running confidence is the average confidence of the accepted fits times
+    the fraction of recent fits that agree with their median:
+    >>> (wn, zeta, confidence) = myIdentifier.estimate()
+    >>> myShaperObject = myIdentifier.input_shaper()
+    >>> myShaperObject.ZVD()
+
+    Optional input wnLimits = [wnMin, wnMax] (rad/s) restricts the frequency
+    range searched for the peak.
+    """
+
+
+    def __init__(self, fps="sampling rate (frame/sec)", windowLength=1024, hopLength=None, wnLimits=None, minConfidence=0.8, forgetFrac=0.9, minSNR=6.0, noiseRiseFrac=0.01, wnTolerance=0.1, historyLength=15):
+        assert windowLength >= 16, "Window length must be at least 16 samples!"
+        assert minConfidence >= 0 and minConfidence <= 1, "Minimum confidence must be between 0 and 1!"
+        assert forgetFrac >= 0 and forgetFrac <= 1, "Forgetting fraction must be between 0 and 1!"
+        assert historyLength >= 3, "History length must be at least 3 estimates!"
+        self.fps = fps
+        self.dt = 1.0/fps
+        self.windowLength = int(windowLength)
+        if hopLength is None:
+            hopLength = self.windowLength//2
+        assert hopLength >= 1 and hopLength <= self.windowLength, "Hop length must be between 1 and the window length!"
+        self.hopLength = int(hopLength)
+        self.wnLimits = wnLimits
+        self.minConfidence = minConfidence
+        self.forgetFrac = forgetFrac
+        self.minSNR = minSNR
+        self.noiseRiseFrac = noiseRiseFrac
+        self.wnTolerance = wnTolerance
+        self.historyLength = int(historyLength)
+        self.reset()
+
+
+    def reset(self):
+        self.buffer = np.zeros(0)
+        self.windowNum = 0
+        self.estimateNum = 0
+        self.wn = np.nan
+        self.zeta = np.nan
+        self.confidence = 0.0
+        self.noiseFloor = np.nan
+        self.wnHistory = []
+        self._wnSum = 0.0
+        self._zetaSum = 0.0
+        self._weightSum = 0.0
+        self._countSum = 0.0
+
+
+    def update(self, samples):
+        """
+        Appends a chunk of measured vibration to the buffer, analyzes every
+        full window that becomes available, and returns a list of the
+        (wn, zeta, confidence) estimates accepted from this chunk.
+        """
+        samples = np.asarray(samples, dtype=float)
+        assert samples.ndim == 1, "Samples must be 1-D; use one ModalIdentifier per channel!"
+        newEstimates = []
+        readNum = 0
+        while readNum < len(samples):
+            # Only copy as much of the chunk as fits in one window
+            takeNum = self.windowLength - len(self.buffer)
+            self.buffer = np.concatenate((self.buffer, samples[readNum:readNum+takeNum]))
+            readNum = readNum + takeNum
+            if len(self.buffer) < self.windowLength:
+                break
+            self.windowNum = self.windowNum + 1
+            if self._above_noise_floor(self.buffer):
+                windowEstimate = fit_damped_sinusoid(self.buffer, self.dt, self.wnLimits)
+                if windowEstimate[2] > 0 and windowEstimate[2] >= self.minConfidence and self._agrees_with_history(windowEstimate[0]):
+                    self._accumulate(windowEstimate)
+                    newEstimates.append(windowEstimate)
+            self.buffer = self.buffer[self.hopLength:]
+        return newEstimates
+
+
+    def estimate(self):
+        return (self.wn, self.zeta, self.confidence)
+
+
+    def input_shaper(self):
+        """
+        Returns an unshaped InputShaper object for the current estimate of the
+        mode, ready for one of the shaper type methods (ZV(), ZVD(), etc.).
+        """
+        assert self.estimateNum > 0, "No modal estimate is available yet!"
+        return InputShaper(self.wn, self.zeta, self.fps)
+
+
+    def _above_noise_floor(self, window):
+        if not np.all(np.isfinite(window)):
+            return False
+        # The quietest eighth of the window, so a decay that dies out or a
+        # pause between excitations also updates the floor
+        window = window - np.mean(window)
+        blockLength = len(window)//8
+        blockPower = np.mean(np.reshape(window[:8*blockLength]**2, (8, blockLength)), axis=1)
+        windowNoise = np.sqrt(np.min(blockPower))
+        if np.isnan(self.noiseFloor) or windowNoise < self.noiseFloor:
+            self.noiseFloor = windowNoise
+        else:
+            self.noiseFloor = (1 + self.noiseRiseFrac)*self.noiseFloor
+        return np.max(np.abs(window)) > self.minSNR*self.noiseFloor
+
+
+    def _agrees_with_history(self, wn):
+        self.wnHistory = (self.wnHistory + [wn])[-self.historyLength:]
+        wnMedian = np.median(self.wnHistory)
+        self._agreementFrac = np.mean(np.abs(np.array(self.wnHistory) - wnMedian) <= self.wnTolerance*wnMedian)
+        if self.estimateNum > 0:
+            self.confidence = self._agreementFrac*self._weightSum/self._countSum
+        return len(self.wnHistory) >= 3 and np.abs(wn - wnMedian) <= self.wnTolerance*wnMedian
+
+
+    def _accumulate(self, windowEstimate):
+        (wn, zeta, confidence) = windowEstimate
+        self.estimateNum = self.estimateNum + 1
+        self._wnSum = self.forgetFrac*self._wnSum + confidence*wn
+        self._zetaSum = self.forgetFrac*self._zetaSum + confidence*zeta
+        self._weightSum = self.forgetFrac*self._weightSum + confidence
+        self._countSum = self.forgetFrac*self._countSum + 1
+        self.wn = self._wnSum/self._weightSum
+        self.zeta = self._zetaSum/self._weightSum
+        self.confidence = self._agreementFrac*self._weightSum/self._countSum
+
+
+def fit_damped_sinusoid(signal, dt, wnLimits=None, trimFrac=0.1, iterationNum=20):
+    """
+    Fits a single damped sinusoid to a segment of measured vibration and
+    returns (wn, zeta, confidence).  The damped frequency is first picked from
+    the peak of the Hann-windowed FFT (with parabolic interpolation between
+    bins).  Starting values for the decay rate and damped frequency come from
+    the log-decrement and phase slope of the band-pass filtered analytic
+    signal, beginning at its envelope peak (the start of the free decay) and
+    ending where the envelope rises again (a new excitation) or reaches the
+    noise floor.  These are then refined by a least-squares fit of a damped
+    sinusoid to the decay, compared only within the band around the peak (half
+    to one and a half times the peak frequency, narrowed to wnLimits if given)
+    so that other modes are excluded.  A fraction "trimFrac" of the segment is
+    ignored at each end, to avoid filter edge effects.  Segments with
+    non-finite samples are not fit.
+
+    Confidence is the fraction of the decay's energy explained by the fit,
+    multiplied by how well a straight line fits the log of the envelope, so
+    beating, restarts, and other departures from a single decay lower it.
+    Returns (nan, nan, 0.0) if the segment does not contain an oscillation
+    that decays by at least 10%, or if the decay does not fit clearly better
+    than an undamped sinusoid (e.g. steady forced vibration), so lightly
+    damped modes need segments that span enough cycles.  This function does
+    not judge whether the decay stands out from sensor noise; ModalIdentifier
+    does that with its noise floor.
+    """
+    noFit = (np.nan, np.nan, 0.0)
+    signal = np.asarray(signal, dtype=float)
+    if not np.all(np.isfinite(signal)): # e.g. logging dropouts
+        return noFit
+    nSamples = len(signal)
+    signal = signal - np.mean(signal)
+    if not np.any(signal):
+        return noFit
+
+    # Peak-picking on the Hann-windowed spectrum, zero-padded to twice the length
+    nFFT = 2*nSamples
+    spectrum = np.abs(np.fft.rfft(signal*np.hanning(nSamples), nFFT))
+    wVec = 2.0*np.pi*np.fft.rfftfreq(nFFT, dt)
+    minBin = 4 # require a few cycles per segment so the decay can be fit
+    maxBin = len(spectrum) - 2
+    if wnLimits is not None:
+        minBin = max([minBin, int(np.ceil(wnLimits[0]/wVec[1]))])
+        maxBin = min([maxBin, int(np.floor(wnLimits[1]/wVec[1]))])
+    if maxBin <= minBin:
+        return noFit
+    peakBin = minBin + np.argmax(spectrum[minBin:maxBin+1])
+    (yLeft, yPeak, yRight) = np.log(spectrum[peakBin-1:peakBin+2] + 1e-300)
+    curvature = yLeft - 2.0*yPeak + yRight
+    binOffset = 0.5*(yLeft - yRight)/curvature if curvature < 0 else 0.0
+    wPeak = (peakBin + binOffset)*wVec[1]
+
+    # Band-pass around the peak and form the analytic signal in one step
+    fullSpectrum = np.fft.fft(signal, nFFT)
+    wFull = 2.0*np.pi*np.fft.fftfreq(nFFT, dt)
+    bandLimits = [0.5*wPeak, 1.5*wPeak]
+    if wnLimits is not None:
+        bandLimits = [max([bandLimits[0], wnLimits[0]]), min([bandLimits[1], wnLimits[1]])]
+    fullSpectrum[(wFull < bandLimits[0]) | (wFull > bandLimits[1])] = 0.0
+    analytic = np.fft.ifft(2.0*fullSpectrum)[:nSamples]
+
+    # The decay runs from the envelope peak until the envelope either rises
+    # well above its lowest value so far (a new excitation) or falls to 2% of
+    # the peak (the noise floor)
+    trimNum = int(trimFrac*nSamples)
+    envelope = np.abs(analytic[:nSamples-trimNum])
+    startNum = trimNum + np.argmax(envelope[trimNum:])
+    decayEnvelope = envelope[startNum:]
+    endIndices = np.nonzero(((decayEnvelope > 1.5*np.minimum.accumulate(decayEnvelope)) & (decayEnvelope > 0.1*decayEnvelope[0])) | (decayEnvelope < 0.02*decayEnvelope[0]))[0]
+    endNum = startNum + endIndices[0] if len(endIndices) > 0 else nSamples - trimNum
+    if endNum - startNum < 8 or (endNum - startNum)*dt*wPeak < 2.0*np.pi: # at least one cycle
+        return noFit
+    analytic = analytic[startNum:endNum]
+    envelope = envelope[startNum:endNum]
+    tVec = dt*np.arange(endNum - startNum)
+    if np.min(envelope) <= 0:
+        return noFit
+
+    # Log-decrement of the envelope and phase slope give the starting values,
+    # weighted by the envelope so the noise floor does not bias them
+    logEnvelope = np.log(envelope)
+    envelopeLine = np.polyfit(tVec, logEnvelope, 1, w=envelope)
+    sigma = -envelopeLine[0]
+    wd = np.polyfit(tVec, np.unwrap(np.angle(analytic)), 1, w=envelope)[0]
+    if wd <= 0:
+        return noFit
+
+    # Gauss-Newton refinement of (sigma, wd) on the unfiltered decay, with
+    # the least squares limited to the band around the peak so other modes do
+    # not enter the fit (the model is truncated the same way as the decay, so
+    # this does not bias it).  The amplitude and phase are solved linearly at
+    # each step.  Sigma is free to reach zero or below, so steady vibration is
+    # not mistaken for a decay.
+    # (zero-padded so that even a short, heavily damped decay spans a few
+    # frequency bins in the band)
+    minFFT = int(np.ceil(16.0*np.pi/(dt*(bandLimits[1] - bandLimits[0]))))
+    fitFFT = max([2*(endNum - startNum), minFFT + minFFT%2])
+    wFit = 2.0*np.pi*np.fft.rfftfreq(fitFFT, dt)
+    bandMask = (wFit >= bandLimits[0]) & (wFit <= bandLimits[1])
+    if np.sum(bandMask) < 3:
+        return noFit
+    measuredBand = np.fft.rfft(signal[startNum:endNum], fitFFT)[bandMask]
+    measured = np.concatenate((measuredBand.real, measuredBand.imag))
+    params = np.array([sigma, wd])
+    residual = _damped_sinusoid_residual(params, tVec, measured, bandMask, fitFFT)
+    for k in range(0, iterationNum):
+        step = 1e-6*params[1]
+        jacobian = np.column_stack([(_damped_sinusoid_residual(params + step*np.eye(2)[i], tVec, measured, bandMask, fitFFT) - residual)/step for i in range(0, 2)])
+        delta = np.linalg.lstsq(jacobian, -residual, rcond=None)[0]
+        newParams = params + delta
+        if newParams[1] <= 0:
+            break
+        newResidual = _damped_sinusoid_residual(newParams, tVec, measured, bandMask, fitFFT)
+        if np.sum(newResidual**2) >= np.sum(residual**2):
+            break
+        (params, residual) = (newParams, newResidual)
+        if np.all(np.abs(delta) < 1e-9*params[1]):
+            break
+    (sigma, wd) = params
+
+    # Reject fits without a measurable decay, or that are not clearly better
+    # than the best undamped sinusoid at the same frequency
+    if np.exp(-sigma*tVec[-1]) > 0.9:
+        return noFit
+    undampedResidual = _damped_sinusoid_residual([0.0, wd], tVec, measured, bandMask, fitFFT)
+    if np.sum(undampedResidual**2) < 2.0*np.sum(residual**2):
+        return noFit
+    wn = np.sqrt(wd**2 + sigma**2)
+    zeta = sigma/wn
+
+    fitFrac = 1.0 - np.sum(residual**2)/np.sum(measured**2)
+    envelopeResidual = logEnvelope - np.polyval(envelopeLine, tVec)
+    envelopeSpread = logEnvelope - np.average(logEnvelope, weights=envelope**2)
+    envelopeFrac = 1.0 - np.sum((envelope*envelopeResidual)**2)/np.sum((envelope*envelopeSpread)**2)
+    confidence = min([1.0, max([0.0, fitFrac*envelopeFrac])])
+    return (wn, zeta, confidence)
+
+
+def _damped_sinusoid_residual(params, tVec, measured, bandMask, fitFFT):
+    # Residual of the best damped sinusoid with decay rate and damped frequency
+    # "params", compared in the frequency bins of "bandMask" (real parts, then
+    # imaginary parts)
+    (sigma, wd) = params
+    decay = np.exp(-sigma*tVec)
+    basis = np.column_stack((decay*np.cos(wd*tVec), decay*np.sin(wd*tVec)))
+    basisBand = np.fft.rfft(basis, fitFFT, axis=0)[bandMask]
+    basis = np.vstack((basisBand.real, basisBand.imag))
+    coeffs = np.linalg.lstsq(basis, measured, rcond=None)[0]
+    return np.dot(basis, coeffs) - measured
+
+
 def digitize_shaper(amps, times, wn, zeta, dt):
     nAmps = len(amps)
     wd = wn*np.sqrt((1.0 - zeta**2.0))
@@ -385,6 +710,97 @@ def digitize_shaper(amps, times, wn, zeta, dt):
     return (digNum, digAmps, digTimes, digFrames)
 
 
+def quantize_shaper(amps, times, wn, zeta, precision="float32"):
+    """
+    Rounds normalized impulse amplitudes to a reduced precision and returns
+    (quantAmps, vibPenalty).  For precision "float32" or "float16" (or the
+    matching numpy types), quantAmps
+    is an array of that type whose values lie on a fixed-point grid fine
+    enough that any partial sum is exact in that type, so the filter's DC gain
+    is exactly one.  For an integer precision, quantAmps is an int64 array of
+    fixed-point weights with that many fractional bits, summing to exactly
+    2**precision.  Rounding errors are assigned to the impulses with the
+    largest remainders.  vibPenalty is the residual vibration of the quantized
+    impulses minus that of the original impulses, at the modeled mode.
+    """
+    floatMantissaBits = {"float32": 23, "float16": 10}
+    amps = np.asarray(amps, dtype=float)
+    if isinstance(precision, (int, np.integer)):
+        fracBits = int(precision)
+    else:
+        precision = np.dtype(precision).name
+        assert precision in floatMantissaBits, "Precision must be float32, float16, or a number of fractional bits!"
+        intBits = max([0, int(np.ceil(np.log2(np.sum(np.abs(amps)))))])
+        fracBits = floatMantissaBits[precision] - intBits
+    assert fracBits >= 1, "Precision is too coarse to represent the input shaper!"
+    assert fracBits <= 52, "Fixed-point precision is limited to 52 fractional bits, the float64 mantissa!"
+
+    scale = 2**fracBits
+    scaledAmps = amps*scale/np.sum(amps)
+    intAmps = np.floor(scaledAmps).astype(np.int64)
+    remainders = scaledAmps - intAmps
+    roundingNum = scale - int(np.sum(intAmps))
+    assert roundingNum >= 0 and roundingNum < len(amps), "Rounding error too large to correct; use fewer fractional bits!"
+    intAmps[np.argsort(-remainders)[:roundingNum]] += 1
+
+    quantAmps = intAmps if precision not in floatMantissaBits else (intAmps/float(scale)).astype(precision)
+    floatAmps = list(intAmps/float(scale))
+    vibPenalty = residual_vibration(floatAmps, list(times), wn, zeta) - residual_vibration(list(amps), list(times), wn, zeta)
+    return (quantAmps, vibPenalty)
+
+
+def shape_signal(signal, amps, frames, fracBits=None, blockLength=4096):
+    """
+    Convolves a sampled command or signal with a digital input shaper given by
+    impulse amplitudes and frames (e.g. digAmps and digFrames).  Samples run
+    along the first axis, so a 2-D array filters one channel per column.  The
+    shaped signal is longer than the input by the shaper duration, holding
+    the final input value.  The output is computed "blockLength" samples at a
+    time, so the only full-length array allocated is the output itself.
+
+    The arithmetic follows the types of the inputs, so float32 amplitudes from
+    quantize() with a float32 signal stay in float32.  For integer weights
+    from quantize(fracBits), pass the same fracBits and an integer signal.
+    The sums are then accumulated in int32 if they cannot overflow it (int64
+    otherwise), rounded back by fracBits, clipped to the range of the
+    signal's type, and returned in that type.
+    """
+    signal = np.asarray(signal)
+    sampleNum = len(signal)
+    assert sampleNum > 0, "Signal must contain at least one sample!"
+    shapedNum = sampleNum + int(max(frames))
+    if fracBits is None:
+        accType = np.result_type(signal, np.asarray(amps))
+        outType = accType
+    else:
+        assert np.issubdtype(signal.dtype, np.integer), "Fixed-point shaping requires an integer signal!"
+        typeInfo = np.iinfo(signal.dtype)
+        maxSum = max([-typeInfo.min, typeInfo.max])*int(np.sum(np.abs(amps))) + (1 << (fracBits - 1))
+        accType = np.int32 if maxSum <= np.iinfo(np.int32).max else np.int64
+        outType = signal.dtype
+    amps = np.asarray(amps).astype(accType)
+
+    shaped = np.empty((shapedNum,) + signal.shape[1:], dtype=outType)
+    accumulator = np.empty((blockLength,) + signal.shape[1:], dtype=accType)
+    for start in range(0, shapedNum, blockLength):
+        stop = min([start + blockLength, shapedNum])
+        blockSum = accumulator[:stop-start]
+        blockSum[...] = 0
+        for (amp, frame) in zip(amps, frames):
+            first = max([start - frame, 0])
+            last = min([stop - frame, sampleNum])
+            if last > first:
+                blockSum[first+frame-start:last+frame-start] += np.multiply(signal[first:last], amp, dtype=accType)
+            if stop - frame > sampleNum: # hold the final input value
+                blockSum[max([sampleNum + frame - start, 0]):] += np.multiply(signal[-1], amp, dtype=accType)
+        if fracBits is not None:
+            blockSum += 1 << (fracBits - 1)
+            blockSum >>= fracBits
+            np.clip(blockSum, typeInfo.min, typeInfo.max, out=blockSum)
+        shaped[start:stop] = blockSum
+    return shaped
+
+
 def residual_vibration(amps, times, wn, zeta, valueAdded=0):
     amps[0] = amps[0] + valueAdded
     amps = [k/sum(amps) for k in amps]
@@ -404,6 +820,109 @@ def scaled_cubic(a0, a1, a2, a3, xIn, kIn):
     return kIn*(a0 + a1*xIn + a2*xIn**2 + a3*xIn**3)
 
 
+def um_impulse_times(shaperType, zeta, Tn):
+    """
+    Returns the impulse times of a "UMZV" or "UMZVD" input shaper by linear
+    interpolation in a table of exact solutions on a uniform grid in damping
+    ratio zeta.  The table is loaded from UM_TABLE_FILE the first time it is
+    needed.  Use um_table_bounds() for the range of zeta covered and the
+    accuracy of the interpolation.
+    """
+    if not _umTables:
+        _load_um_tables()
+    zetaStep = _umTables["zetaStep"]
+    table = _umTables[shaperType]
+    assert zeta >= 0 and zeta <= zetaStep*(len(table) - 1), "%s table only covers damping ratios from 0 to %.2f!" %(shaperType, zetaStep*(len(table) - 1))
+    position = zeta/zetaStep
+    k = int(position) if position < len(table) - 1 else len(table) - 2
+    frac = position - k
+    return [0.0] + [Tn*((1 - frac)*a + frac*b) for (a, b) in zip(table[k], table[k+1])]
+
+
+def um_table_bounds():
+    """
+    Returns (zetaMax, timeErrorBound, vibErrorBound) for the UMZV and UMZVD
+    solution tables, loading them if needed.  zetaMax is the largest damping
+    ratio covered, timeErrorBound is the largest interpolation error in the
+    impulse times as a fraction of the period Tn, and vibErrorBound is the
+    largest residual vibration caused by that error.
+    """
+    if not _umTables:
+        _load_um_tables()
+    zetaMax = _umTables["zetaStep"]*(len(_umTables["UMZV"]) - 1)
+    return (zetaMax, _umTables["timeErrorBound"], _umTables["vibErrorBound"])
+
+
+def _load_um_tables(fileName=UM_TABLE_FILE):
+    with np.load(fileName) as data:
+        _umTables["zetaStep"] = float(data["zetaStep"])
+        _umTables["timeErrorBound"] = float(data["timeErrorBound"])
+        _umTables["vibErrorBound"] = float(data["vibErrorBound"])
+        for shaperType in UM_AMPS:
+            _umTables[shaperType] = data[shaperType].astype(float).tolist()
+
+
+def generate_um_tables(fileName=UM_TABLE_FILE, zetaMax=0.9, zetaNum=1801):
+    """
+    Solves for the exact UMZV and UMZVD impulse times (as fractions of the
+    period Tn) on a uniform grid of zetaNum damping ratios from 0 to zetaMax,
+    and saves them to fileName for um_impulse_times().  Each solution starts
+    from the one at the previous grid point.  The interpolation error bounds
+    are found by solving at every midpoint of the grid.
+    """
+    zetaVec = np.linspace(0, zetaMax, 2*zetaNum - 1)
+    zetaStep = zetaVec[2]
+    startTimes = {"UMZV": [1/6.0, 1/3.0], "UMZVD": [0.0895, 0.3662, 0.6430, 0.7325]}
+    tables = {}
+    timeErrorBound = 0.0
+    vibErrorBound = 0.0
+    for shaperType in UM_AMPS:
+        amps = UM_AMPS[shaperType]
+        times = np.array(startTimes[shaperType])
+        solutions = []
+        for zeta in zetaVec:
+            times = _solve_um_times(amps, times, zeta)
+            solutions.append(times)
+        solutions = np.array(solutions)
+        tables[shaperType] = solutions[::2].astype(np.float32)
+
+        gridTimes = tables[shaperType].astype(float)
+        midTimes = 0.5*(gridTimes[:-1] + gridTimes[1:])
+        timeErrorBound = max([timeErrorBound, np.max(np.abs(midTimes - solutions[1::2]))])
+        for (zeta, times) in zip(zetaVec[1::2], midTimes):
+            vibErrorBound = max([vibErrorBound, residual_vibration(list(amps), [0.0] + list(2.0*np.pi*times), 1.0, zeta)])
+
+    np.savez_compressed(fileName, zetaStep=zetaStep, timeErrorBound=timeErrorBound, vibErrorBound=vibErrorBound, **tables)
+    _umTables.clear()
+
+
+def _solve_um_times(amps, times, zeta, tolerance=1e-14, iterationNum=50):
+    # Newton's method on the zero-vibration (and, for five impulses,
+    # zero-derivative) constraints, with wn = 1 so times are fractions of Tn
+    times = np.array(times, dtype=float)
+    for k in range(0, iterationNum):
+        constraints = _um_constraints(amps, times, zeta)
+        step = 1e-7
+        jacobian = np.column_stack([(_um_constraints(amps, times + step*np.eye(len(times))[i], zeta) - constraints)/step for i in range(0, len(times))])
+        delta = np.linalg.solve(jacobian, -constraints)
+        times = times + delta
+        if np.max(np.abs(delta)) < tolerance:
+            break
+    assert np.max(np.abs(_um_constraints(amps, times, zeta))) < 1e-9, "Could not solve for unity-magnitude impulse times at zeta = %f!" %zeta
+    return times
+
+
+def _um_constraints(amps, times, zeta):
+    # Scaled by the decay up to the last impulse so heavy damping stays well-conditioned
+    t = 2.0*np.pi*np.concatenate(([0.0], times))
+    growth = amps*np.e**(zeta*(t - t[-1]))
+    wd = np.sqrt(1.0 - zeta**2.0)
+    constraints = [np.dot(growth, np.cos(wd*t)), np.dot(growth, np.sin(wd*t))]
+    if len(amps) > 3:
+        constraints.extend((np.dot(t*growth, np.cos(wd*t))/t[-1], np.dot(t*growth, np.sin(wd*t))/t[-1]))
+    return np.array(constraints)
+
+
 def shapermaker():
     try:
         import shapermaker
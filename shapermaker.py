@@ -242,6 +242,13 @@ class ShaperMakerGUI(wx.Frame):
         self.strength = float(self.tec5.Value)
         self.parameter = float(self.tec6.Value)
 
+        # UMZV and UMZVD impulse times are only tabulated up to a maximum damping ratio
+        if (self.shaperType == 'UMZV') or (self.shaperType == 'UMZVD'):
+            zetaMax = inputshaping.um_table_bounds()[0]
+            if self.zeta < 0 or self.zeta > zetaMax:
+                self.SetStatusText(" %s shapers require a damping ratio between 0 and %.2f" %(self.shaperType, zetaMax))
+                return
+
         # Design input shaper with inputshaper module
         ins = inputshaping.InputShaper(self.wn, self.zeta, self.fps)
         if (self.shaperType == 'SNA') or (self.shaperType == 'EI'):
@@ -0,0 +1,85 @@
+import numpy as np
+import inputshaping
+
+
+FPS = 200.0
+WN = 2.0*np.pi*5.0
+ZETA = 0.03
+
+
+def _decay(duration, wn=WN, zeta=ZETA):
+    t = np.arange(int(duration*FPS))/FPS
+    return np.exp(-zeta*wn*t)*np.sin(wn*np.sqrt(1.0 - zeta**2)*t)
+
+
+def test_identifier_rejects_noise_only_stream():
+    rng = np.random.default_rng(0)
+    identifier = inputshaping.ModalIdentifier(FPS)
+    assert identifier.update(rng.standard_normal(int(600*FPS))) == []
+    assert identifier.estimateNum == 0
+
+
+def test_identifier_sparse_hits_in_noise():
+    # 10 s decay after each hit, then 110 s of 0.5% sensor noise
+    rng = np.random.default_rng(1)
+    identifier = inputshaping.ModalIdentifier(FPS)
+    for k in range(0, 8):
+        log = np.concatenate((_decay(10.0), np.zeros(int(110*FPS)))) + 0.005*rng.standard_normal(int(120*FPS))
+        for chunk in np.array_split(log, 24):
+            identifier.update(chunk)
+            if identifier.estimateNum > 0:
+                assert abs(identifier.wn - WN) < 0.01*WN
+    (wn, zeta, confidence) = identifier.estimate()
+    assert identifier.estimateNum > 0
+    assert abs(zeta - ZETA) < 0.1*ZETA
+    assert confidence > 0.8
+
+
+def test_fit_rejects_steady_vibration():
+    t = np.arange(1024)/FPS
+    assert inputshaping.fit_damped_sinusoid(np.sin(WN*t), 1.0/FPS)[2] == 0.0
+
+
+def test_fit_isolates_mode_with_wn_limits():
+    wnHigh = 2.0*np.pi*20.0
+    signal = _decay(1024/FPS, wnHigh, 0.02) + 0.5*_decay(1024/FPS)
+    (wn, zeta, confidence) = inputshaping.fit_damped_sinusoid(signal, 1.0/FPS, [2.0*np.pi*15, 2.0*np.pi*30])
+    assert abs(wn - wnHigh) < 0.01*wnHigh
+    assert abs(zeta - 0.02) < 0.002
+
+
+def test_fit_rejects_non_finite_samples():
+    signal = _decay(1024/FPS)
+    signal[300] = np.nan
+    assert inputshaping.fit_damped_sinusoid(signal, 1.0/FPS)[2] == 0.0
+
+
+def test_quantize_keeps_unity_dc_gain():
+    shaper = inputshaping.InputShaper(WN, 0.1, FPS)
+    shaper.UMZVD()
+    for fracBits in [8, 15, 31, 52]:
+        (quantAmps, vibPenalty) = shaper.quantize(fracBits)
+        assert int(np.sum(quantAmps)) == 2**fracBits
+    for precision in ["float32", np.float32, np.float16]:
+        (quantAmps, vibPenalty) = shaper.quantize(precision)
+        assert quantAmps.dtype == np.dtype(precision)
+        assert np.sum(quantAmps, dtype=quantAmps.dtype) == 1
+
+
+def test_shape_signal_fixed_point_saturates():
+    signal = np.array([0, 30000, -30000, 30000], dtype=np.int16)
+    shaped = inputshaping.shape_signal(signal, np.array([65536, -32768]), [0, 1], 15)
+    assert shaped.dtype == np.int16
+    assert list(shaped) == [0, 32767, -32768, 32767, 30000]
+
+
+def test_shape_signal_matches_float_convolution():
+    shaper = inputshaping.InputShaper(WN, 0.1, FPS)
+    shaper.ZVD()
+    signal = np.random.default_rng(2).standard_normal(5000)
+    shaped = inputshaping.shape_signal(signal, shaper.digAmps, shaper.digFrames, blockLength=777)
+    padded = np.concatenate((signal, np.repeat(signal[-1], max(shaper.digFrames))))
+    expected = np.zeros(len(padded))
+    for (amp, frame) in zip(shaper.digAmps, shaper.digFrames):
+        expected[frame:] += amp*padded[:len(padded)-frame]
+    assert np.allclose(shaped, expected)